@@ -32,7 +32,7 @@ class HybridAnalysisEngineWithRules:
         self.rule_engine = RuleEngine(rules_dir)
         
         logger.info(f"🔬 Hybrid engine with rule packs ready")
-        logger.info(f"   Rule packs: {list(self.rule_engine.rule_packs.keys())}")
+        logger.info(f"   Rule packs: {self.rule_engine.get_available_packs()}")
     
     async def analyze(
         self, 
@@ -11,69 +11,74 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Line patterns, compiled once at import
+_PATTERNS = [
+    {
+        'regex': r'eval\s*\(',
+        'type': 'eval-usage',
+        'severity': 'high',
+        'message': 'eval() is dangerous',
+        'cwe': 'CWE-95',
+        'fix': 'Use ast.literal_eval() or json.loads()'
+    },
+    {
+        'regex': r'exec\s*\(',
+        'type': 'exec-usage',
+        'severity': 'high',
+        'message': 'exec() allows arbitrary code execution',
+        'cwe': 'CWE-95',
+        'fix': 'Remove exec() and refactor'
+    },
+    {
+        'regex': r'pickle\.load',
+        'type': 'insecure-deserialization',
+        'severity': 'medium',
+        'message': 'pickle is unsafe for untrusted data',
+        'cwe': 'CWE-502',
+        'fix': 'Use JSON for serialization'
+    },
+    {
+        'regex': r'hashlib\.(md5|sha1)\s*\(',
+        'type': 'weak-crypto',
+        'severity': 'medium',
+        'message': 'Weak cryptographic hash',
+        'cwe': 'CWE-327',
+        'fix': 'Use hashlib.sha256() or sha512()'
+    },
+    {
+        'regex': r'(?:password|api[_-]?key|secret|token)\s*=\s*["\'][^\'"]{8,}["\']',
+        'type': 'hardcoded-secret',
+        'severity': 'critical',
+        'message': 'Hardcoded secret detected',
+        'cwe': 'CWE-798',
+        'fix': 'Use environment variables'
+    },
+    {
+        'regex': r'os\.system\s*\(',
+        'type': 'command-injection',
+        'severity': 'high',
+        'message': 'os.system() enables command injection',
+        'cwe': 'CWE-78',
+        'fix': 'Use subprocess.run() with shell=False'
+    },
+    {
+        'regex': r'subprocess\.(call|run|Popen).*shell\s*=\s*True',
+        'type': 'command-injection',
+        'severity': 'high',
+        'message': 'shell=True enables command injection',
+        'cwe': 'CWE-78',
+        'fix': 'Set shell=False and use list arguments'
+    },
+]
+_COMPILED_PATTERNS = tuple((re.compile(p['regex'], re.IGNORECASE), p) for p in _PATTERNS)
+
+
 class PythonAnalyzer:
     """Production Python security analyzer"""
     
     def __init__(self):
         self.has_bandit = self._check_bandit()
-        self.patterns = [
-            {
-                'regex': r'eval\s*\(',
-                'type': 'eval-usage',
-                'severity': 'high',
-                'message': 'eval() is dangerous',
-                'cwe': 'CWE-95',
-                'fix': 'Use ast.literal_eval() or json.loads()'
-            },
-            {
-                'regex': r'exec\s*\(',
-                'type': 'exec-usage',
-                'severity': 'high',
-                'message': 'exec() allows arbitrary code execution',
-                'cwe': 'CWE-95',
-                'fix': 'Remove exec() and refactor'
-            },
-            {
-                'regex': r'pickle\.load',
-                'type': 'insecure-deserialization',
-                'severity': 'medium',
-                'message': 'pickle is unsafe for untrusted data',
-                'cwe': 'CWE-502',
-                'fix': 'Use JSON for serialization'
-            },
-            {
-                'regex': r'hashlib\.(md5|sha1)\s*\(',
-                'type': 'weak-crypto',
-                'severity': 'medium',
-                'message': 'Weak cryptographic hash',
-                'cwe': 'CWE-327',
-                'fix': 'Use hashlib.sha256() or sha512()'
-            },
-            {
-                'regex': r'(?:password|api[_-]?key|secret|token)\s*=\s*["\'][^\'"]{8,}["\']',
-                'type': 'hardcoded-secret',
-                'severity': 'critical',
-                'message': 'Hardcoded secret detected',
-                'cwe': 'CWE-798',
-                'fix': 'Use environment variables'
-            },
-            {
-                'regex': r'os\.system\s*\(',
-                'type': 'command-injection',
-                'severity': 'high',
-                'message': 'os.system() enables command injection',
-                'cwe': 'CWE-78',
-                'fix': 'Use subprocess.run() with shell=False'
-            },
-            {
-                'regex': r'subprocess\.(call|run|Popen).*shell\s*=\s*True',
-                'type': 'command-injection',
-                'severity': 'high',
-                'message': 'shell=True enables command injection',
-                'cwe': 'CWE-78',
-                'fix': 'Set shell=False and use list arguments'
-            },
-        ]
+        self.patterns = _PATTERNS
     
     def _check_bandit(self) -> bool:
         try:
@@ -143,8 +148,8 @@ class PythonAnalyzer:
         lines = code.split('\n')
         
         for i, line in enumerate(lines, 1):
-            for pattern in self.patterns:
-                if re.search(pattern['regex'], line, re.IGNORECASE):
+            for regex, pattern in _COMPILED_PATTERNS:
+                if regex.search(line):
                     findings.append({
                         'type': pattern['type'],
                         'severity': pattern['severity'],
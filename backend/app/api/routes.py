@@ -209,12 +209,12 @@ async def get_scanners_status():
             "javascript": {"available": True}
         },
         "secrets": {
-            "detect_secrets": engine.secrets.has_detect_secrets,
+            "detect_secrets": await engine.secrets.detect_secrets_available(),
             "patterns": len(engine.secrets.patterns),
             "entropy": True
         },
         "licenses": {
-            "scancode": engine.licenses.has_scancode,
+            "scancode": await engine.licenses.scancode_available(),
             "patterns": len(engine.licenses.license_patterns)
         },
         "ai": {
@@ -196,11 +196,11 @@ async def get_scanners_status():
         "secrets_detection": {
             "pattern_based": True,
             "entropy_detection": True,
-            "detect_secrets": _engine.secrets.has_detect_secrets
+            "detect_secrets": await _engine.secrets.detect_secrets_available()
         },
         "license_scanning": {
             "pattern_based": True,
-            "scancode": _engine.licenses.has_scancode
+            "scancode": await _engine.licenses.scancode_available()
         },
         "duplication_detection": {
             "enabled": True,
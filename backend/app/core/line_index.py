@@ -0,0 +1,44 @@
+"""
+Line Index
+Maps match offsets in a source buffer back to line numbers and line text
+"""
+import bisect
+from typing import List, Union
+
+
+class LineIndex:
+    """
+    Offset-to-line lookup for whole-buffer regex scans
+    Built once per file so scanners can run `finditer` over the full
+    buffer instead of splitting it into lines first
+    """
+
+    def __init__(self, code: Union[str, bytes]):
+        self.code = code
+        self.line_starts: List[int] = [0]
+
+        newline = b'\n' if isinstance(code, bytes) else '\n'
+        pos = code.find(newline)
+        while pos != -1:
+            self.line_starts.append(pos + 1)
+            pos = code.find(newline, pos + 1)
+
+    def line_of(self, offset: int) -> int:
+        """1-based line number containing offset"""
+        return bisect.bisect_right(self.line_starts, offset)
+
+    def line_text(self, line: int) -> str:
+        """Text of a 1-based line, without its trailing newline"""
+        start = self.line_starts[line - 1]
+        if line < len(self.line_starts):
+            text = self.code[start:self.line_starts[line] - 1]
+        else:
+            text = self.code[start:]
+        return decode(text)
+
+
+def decode(text: Union[str, bytes]) -> str:
+    """Decode a byte slice for reporting; str passes through"""
+    if isinstance(text, bytes):
+        return text.decode('utf-8', 'replace')
+    return text
@@ -12,9 +12,11 @@ Integrates ALL scanners for comprehensive analysis:
 """
 
 import asyncio
+import functools
+import hashlib
 import time
-from typing import List, Dict, Any, Optional
-from collections import defaultdict
+from typing import List, Dict, Any, Optional, Union
+from collections import defaultdict, OrderedDict
 
 from app.analyzers.python_analyzer import PythonAnalyzer
 from app.analyzers.javascript_analyzer import JavaScriptAnalyzer
@@ -25,6 +27,66 @@ from app.scanners.coding_standards_scanner import get_coding_standards_scanner
 from app.services.rule_engine import RuleEngine
 from app.services.gemini_analyzer import GeminiAnalyzer
 
+# Scan results kept per engine, keyed by scanner + content hash
+SCAN_CACHE_MAX_ENTRIES = 1024
+
+
+
+class _CachedScanner:
+    """
+    Memoizes a scanner's async scan() on a BLAKE2b hash of its input
+    Scanners are deterministic for a given (code, filename, language), so
+    re-scanning an identical buffer just returns copies of the first run.
+    A scan still in flight is cached as its future, so concurrent callers
+    share it. Everything else is forwarded to the wrapped scanner
+    """
+    
+    def __init__(self, name: str, scanner, cache: "OrderedDict[bytes, Any]"):
+        self._name = name
+        self._scanner = scanner
+        self._cache = cache
+    
+    def __getattr__(self, attr):
+        return getattr(self._scanner, attr)
+    
+    async def scan(self, code: Union[str, bytes], filename: str, *args, **kwargs) -> List[Dict[str, Any]]:
+        h = hashlib.blake2b(digest_size=16)
+        for part in (self._name, filename, *args, *sorted(kwargs.items())):
+            h.update(str(part).encode('utf-8'))
+            h.update(b'\x00')
+        h.update(code.encode('utf-8') if isinstance(code, str) else code)
+        key = h.digest()
+        
+        cached = self._cache.get(key)
+        if cached is None:
+            cached = asyncio.ensure_future(self._scanner.scan(code, filename, *args, **kwargs))
+            cached.add_done_callback(functools.partial(self._settle, key))
+            self._cache[key] = cached
+            if len(self._cache) > SCAN_CACHE_MAX_ENTRIES:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(key)
+        
+        if isinstance(cached, asyncio.Future):
+            if cached.get_loop() is not asyncio.get_running_loop():
+                # In flight on another loop; can't await it from here
+                cached = await self._scanner.scan(code, filename, *args, **kwargs)
+            else:
+                # Shielded so one cancelled caller doesn't cancel the others
+                cached = await asyncio.shield(cached)
+        
+        # Copilot scrutiny rewrites findings in place
+        return [dict(f) for f in cached]
+    
+    def _settle(self, key: bytes, future: "asyncio.Future"):
+        """Replace a finished scan's future with its findings; drop failures"""
+        if self._cache.get(key) is not future:
+            return
+        if future.cancelled() or future.exception() is not None:
+            del self._cache[key]
+        else:
+            self._cache[key] = future.result()
+
 
 class UltimateHybridEngine:
     """
@@ -41,11 +103,12 @@ class UltimateHybridEngine:
         self.python = PythonAnalyzer()
         self.javascript = JavaScriptAnalyzer()
         
-        # Advanced scanners
-        self.secrets = get_secrets_scanner()
-        self.licenses = get_license_scanner()
-        self.duplication = get_duplication_scanner()
-        self.coding_standards = get_coding_standards_scanner()
+        # Advanced scanners, memoized on content hash
+        self._scan_cache: "OrderedDict[bytes, Any]" = OrderedDict()
+        self.secrets = _CachedScanner('secrets', get_secrets_scanner(), self._scan_cache)
+        self.licenses = _CachedScanner('licenses', get_license_scanner(), self._scan_cache)
+        self.duplication = _CachedScanner('duplication', get_duplication_scanner(), self._scan_cache)
+        self.coding_standards = _CachedScanner('coding_standards', get_coding_standards_scanner(), self._scan_cache)
         
         # Enterprise & AI
         self.rules = RuleEngine(rules_dir)
@@ -79,13 +142,17 @@ class UltimateHybridEngine:
         Returns:
             Complete analysis results with all findings
         """
-        start_time = time.time()
+        start_ns = time.perf_counter_ns()
+        
+        # Byte-level scanners share one UTF-8 encode instead of each
+        # re-encoding the source
+        code_bytes = code.encode('utf-8')
         
         # Step 1-7: Run all scanners in parallel for speed
         results = await asyncio.gather(
             self._run_static_analysis(code, filename, language),
-            self._run_secrets_detection(code, filename),
-            self._run_license_scanning(code, filename),
+            self._run_secrets_detection(code_bytes, filename),
+            self._run_license_scanning(code_bytes, filename),
             self._run_duplication_detection(code, filename),
             self._run_coding_standards(code, filename, language),
             self._run_enterprise_rules(code, filename, language, enabled_rule_packs),
@@ -127,7 +194,7 @@ class UltimateHybridEngine:
         if copilot_detected:
             all_findings = self._apply_copilot_scrutiny(all_findings)
         
-        duration = time.time() - start_time
+        duration_ns = time.perf_counter_ns() - start_ns
         
         # Build comprehensive result
         result = {
@@ -136,7 +203,8 @@ class UltimateHybridEngine:
             'by_severity': self._count_by_severity(all_findings),
             'by_source': self._count_by_source(all_findings),
             'by_type': self._count_by_type(all_findings),
-            'duration': duration,
+            'duration': duration_ns / 1e9,
+            'duration_ns': duration_ns,
             'copilot_detected': copilot_detected,
             'language': language,
             'filename': filename,
@@ -201,11 +269,11 @@ class UltimateHybridEngine:
             return await self.javascript.analyze(code, filename)
         return []
     
-    async def _run_secrets_detection(self, code: str, filename: str) -> List[Dict[str, Any]]:
+    async def _run_secrets_detection(self, code: Union[str, bytes], filename: str) -> List[Dict[str, Any]]:
         """Run secrets detection"""
         return await self.secrets.scan(code, filename)
     
-    async def _run_license_scanning(self, code: str, filename: str) -> List[Dict[str, Any]]:
+    async def _run_license_scanning(self, code: Union[str, bytes], filename: str) -> List[Dict[str, Any]]:
         """Run license compliance scanning"""
         return await self.licenses.scan(code, filename)
     
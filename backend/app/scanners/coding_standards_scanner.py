@@ -6,6 +6,19 @@ Enforces naming conventions, logging requirements, and error handling patterns
 import re
 from typing import List, Dict, Any
 
+# Line patterns, compiled once at import
+_CAMEL_CASE_ASSIGN_RE = re.compile(r'\b([a-z]+[A-Z][a-zA-Z]*)\s*=')
+_MIXED_CASE_ASSIGN_RE = re.compile(r'\b([A-Z][a-z]+[A-Z][a-zA-Z]*)\s*=')
+_LOWER_CLASS_DEF_RE = re.compile(r'class\s+([a-z_][a-z0-9_]*)\s*[:\(]')
+_TYPED_EXCEPT_RE = re.compile(r'except\s+\w+\s*:')
+_BARE_EXCEPT_RE = re.compile(r'\s*except\s*:')
+_EXCEPT_PASS_RE = re.compile(r'except[^:]*:\s*pass')
+_DEF_RE = re.compile(r'\s*def\s+\w+')
+_PUBLIC_DEF_RE = re.compile(r'\s*def\s+([a-zA-Z][a-zA-Z0-9_]*)\s*\(')
+_CLASS_DEF_RE = re.compile(r'\s*class\s+(\w+)')
+_VAR_DECL_RE = re.compile(r'\s*var\s+')
+_CAMEL_BOUNDARY_RE = re.compile(r'(?<!^)(?=[A-Z])')
+
 
 class CodingStandardsScanner:
     """Enforces enterprise coding standards beyond security"""
@@ -42,6 +55,8 @@ class CodingStandardsScanner:
     def _check_python_standards(self, code: str, filename: str) -> List[Dict[str, Any]]:
         """Check Python-specific coding standards"""
         findings = []
+        # Split once; every check and block lookup shares this list instead
+        # of re-splitting the whole file per line
         lines = code.split('\n')
         
         for i, line in enumerate(lines, 1):
@@ -49,13 +64,13 @@ class CodingStandardsScanner:
             findings.extend(self._check_naming_conventions(line, i, 'python'))
             
             # 2. Logging requirement checks
-            findings.extend(self._check_logging_standards(line, i, code))
+            findings.extend(self._check_logging_standards(line, i, lines))
             
             # 3. Error handling checks
-            findings.extend(self._check_error_handling(line, i, code))
+            findings.extend(self._check_error_handling(line, i, lines))
             
             # 4. Documentation checks
-            findings.extend(self._check_documentation(line, i, code))
+            findings.extend(self._check_documentation(line, i, lines))
         
         return findings
     
@@ -65,7 +80,7 @@ class CodingStandardsScanner:
         
         if language == 'python':
             # Check for camelCase in Python (should be snake_case)
-            camel_case_vars = re.findall(r'\b([a-z]+[A-Z][a-zA-Z]*)\s*=', line)
+            camel_case_vars = _CAMEL_CASE_ASSIGN_RE.findall(line)
             for var in camel_case_vars:
                 findings.append({
                     'type': 'naming-convention-violation',
@@ -81,7 +96,7 @@ class CodingStandardsScanner:
                 })
             
             # Check for uppercase constants not in SCREAMING_SNAKE_CASE
-            const_pattern = re.findall(r'\b([A-Z][a-z]+[A-Z][a-zA-Z]*)\s*=', line)
+            const_pattern = _MIXED_CASE_ASSIGN_RE.findall(line)
             for const in const_pattern:
                 if const not in ['True', 'False', 'None']:
                     findings.append({
@@ -98,7 +113,7 @@ class CodingStandardsScanner:
                     })
             
             # Check for class names not in PascalCase
-            class_def = re.search(r'class\s+([a-z_][a-z0-9_]*)\s*[:\(]', line)
+            class_def = _LOWER_CLASS_DEF_RE.search(line)
             if class_def:
                 class_name = class_def.group(1)
                 findings.append({
@@ -116,7 +131,7 @@ class CodingStandardsScanner:
         
         return findings
     
-    def _check_logging_standards(self, line: str, line_num: int, full_code: str) -> List[Dict[str, Any]]:
+    def _check_logging_standards(self, line: str, line_num: int, lines: List[str]) -> List[Dict[str, Any]]:
         """Check logging requirement violations"""
         findings = []
         
@@ -135,9 +150,9 @@ class CodingStandardsScanner:
             })
         
         # Check for exception handling without logging
-        if re.search(r'except\s+\w+\s*:', line):
+        if _TYPED_EXCEPT_RE.search(line):
             # Look ahead for logging in the except block
-            except_block = self._extract_except_block(full_code, line_num)
+            except_block = self._extract_except_block(lines, line_num)
             if 'logger' not in except_block and 'logging' not in except_block:
                 findings.append({
                     'type': 'missing-exception-logging',
@@ -153,12 +168,12 @@ class CodingStandardsScanner:
         
         return findings
     
-    def _check_error_handling(self, line: str, line_num: int, full_code: str) -> List[Dict[str, Any]]:
+    def _check_error_handling(self, line: str, line_num: int, lines: List[str]) -> List[Dict[str, Any]]:
         """Check error handling pattern violations"""
         findings = []
         
         # Check for bare except clauses
-        if re.match(r'\s*except\s*:', line):
+        if _BARE_EXCEPT_RE.match(line):
             findings.append({
                 'type': 'bare-except-clause',
                 'severity': 'high',
@@ -173,8 +188,8 @@ class CodingStandardsScanner:
         
         # Check for pass in except blocks
         if 'except' in line:
-            except_block = self._extract_except_block(full_code, line_num)
-            if re.search(r'except[^:]*:\s*pass', except_block):
+            except_block = self._extract_except_block(lines, line_num)
+            if _EXCEPT_PASS_RE.search(except_block):
                 findings.append({
                     'type': 'silent-exception',
                     'severity': 'high',
@@ -188,8 +203,8 @@ class CodingStandardsScanner:
                 })
         
         # Check for functions without try-except
-        if re.match(r'\s*def\s+\w+', line) and 'main' not in line:
-            func_body = self._extract_function_body(full_code, line_num)
+        if _DEF_RE.match(line) and 'main' not in line:
+            func_body = self._extract_function_body(lines, line_num)
             # Check if function does I/O or external calls
             has_io = any(keyword in func_body for keyword in ['open(', 'requests.', 'http', 'db.', 'subprocess'])
             has_try = 'try:' in func_body
@@ -208,17 +223,18 @@ class CodingStandardsScanner:
         
         return findings
     
-    def _check_documentation(self, line: str, line_num: int, full_code: str) -> List[Dict[str, Any]]:
+    def _check_documentation(self, line: str, line_num: int, lines: List[str]) -> List[Dict[str, Any]]:
         """Check documentation requirements"""
         findings = []
         
         # Check for public functions without docstrings
-        if re.match(r'\s*def\s+([a-zA-Z][a-zA-Z0-9_]*)\s*\(', line):
-            func_name = re.search(r'def\s+([a-zA-Z][a-zA-Z0-9_]*)', line).group(1)
+        public_def = _PUBLIC_DEF_RE.match(line)
+        if public_def:
+            func_name = public_def.group(1)
             
             # Skip private functions
             if not func_name.startswith('_'):
-                func_body = self._extract_function_body(full_code, line_num)
+                func_body = self._extract_function_body(lines, line_num)
                 lines_after = func_body.split('\n')[:3]
                 
                 has_docstring = any('"""' in l or "'''" in l for l in lines_after)
@@ -237,13 +253,13 @@ class CodingStandardsScanner:
                     })
         
         # Check for class without docstring
-        if re.match(r'\s*class\s+\w+', line):
+        class_def = _CLASS_DEF_RE.match(line)
+        if class_def:
             class_body_start = line_num + 1
-            lines = full_code.split('\n')
             if class_body_start < len(lines):
                 next_line = lines[class_body_start].strip()
                 if not (next_line.startswith('"""') or next_line.startswith("'''")):
-                    class_name = re.search(r'class\s+(\w+)', line).group(1)
+                    class_name = class_def.group(1)
                     findings.append({
                         'type': 'missing-class-docstring',
                         'severity': 'low',
@@ -265,7 +281,7 @@ class CodingStandardsScanner:
         
         for i, line in enumerate(lines, 1):
             # Check for var usage (should use const/let)
-            if re.match(r'\s*var\s+', line):
+            if _VAR_DECL_RE.match(line):
                 findings.append({
                     'type': 'deprecated-var-usage',
                     'severity': 'medium',
@@ -295,7 +311,7 @@ class CodingStandardsScanner:
     # Helper methods
     def _to_snake_case(self, name: str) -> str:
         """Convert camelCase to snake_case"""
-        return re.sub(r'(?<!^)(?=[A-Z])', '_', name).lower()
+        return _CAMEL_BOUNDARY_RE.sub('_', name).lower()
     
     def _to_screaming_snake_case(self, name: str) -> str:
         """Convert to SCREAMING_SNAKE_CASE"""
@@ -305,9 +321,8 @@ class CodingStandardsScanner:
         """Convert snake_case to PascalCase"""
         return ''.join(word.capitalize() for word in name.split('_'))
     
-    def _extract_except_block(self, code: str, except_line: int) -> str:
+    def _extract_except_block(self, lines: List[str], except_line: int) -> str:
         """Extract the content of an except block"""
-        lines = code.split('\n')
         if except_line >= len(lines):
             return ""
         
@@ -323,9 +338,8 @@ class CodingStandardsScanner:
         
         return '\n'.join(block)
     
-    def _extract_function_body(self, code: str, func_line: int) -> str:
+    def _extract_function_body(self, lines: List[str], func_line: int) -> str:
         """Extract the body of a function"""
-        lines = code.split('\n')
         if func_line >= len(lines):
             return ""
         
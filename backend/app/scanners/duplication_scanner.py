@@ -4,11 +4,31 @@ Detects copied code, near-duplicates, and OSS license violations
 """
 
 import re
-import hashlib
 from typing import List, Dict, Any
 from difflib import SequenceMatcher
 import asyncio
 
+# Normalization patterns, compiled once at import
+_COMMENT_RE = re.compile(r'#.*$', re.MULTILINE)
+_WHITESPACE_RE = re.compile(r'\s+')
+_DOUBLE_QUOTED_RE = re.compile(r'"[^"]*"')
+_SINGLE_QUOTED_RE = re.compile(r"'[^']*'")
+_IDENTIFIER_RE = re.compile(r'\b[a-z_][a-z0-9_]*\b')
+_NUMBER_RE = re.compile(r'\b\d+\b')
+
+
+def _similar_above(norm1: str, norm2: str, threshold: float) -> float:
+    """
+    SequenceMatcher ratio of two normalized snippets, or 0.0 when it
+    can't exceed threshold. The length and multiset bounds (real_quick_ratio,
+    quick_ratio) are upper bounds on ratio(), so most pairs never reach
+    the quadratic matcher
+    """
+    matcher = SequenceMatcher(None, norm1, norm2)
+    if matcher.real_quick_ratio() <= threshold or matcher.quick_ratio() <= threshold:
+        return 0.0
+    return matcher.ratio()
+
 
 class DuplicationScanner:
     """Detects code duplication and cloning"""
@@ -27,6 +47,9 @@ class DuplicationScanner:
                 'license': 'Public Domain'
             }
         ]
+        # Snippets are fixed, so normalize them once
+        for pattern in self.known_oss_patterns:
+            pattern['normalized'] = self._normalize_code(pattern['snippet'])
         
     async def scan(self, code: str, filename: str) -> List[Dict[str, Any]]:
         """
@@ -59,11 +82,13 @@ class DuplicationScanner:
         
         # Extract code blocks (simplified - functions/classes)
         blocks = self._extract_code_blocks(code)
+        # Normalize each block once, not once per pair
+        normalized = [self._normalize_code(block['code']) for block in blocks]
         
         # Compare blocks for similarity
         for i, block1 in enumerate(blocks):
             for j, block2 in enumerate(blocks[i+1:], i+1):
-                similarity = self._calculate_similarity(block1['code'], block2['code'])
+                similarity = _similar_above(normalized[i], normalized[j], 0.85)
                 
                 if similarity > 0.85:  # 85% similar
                     findings.append({
@@ -85,9 +110,10 @@ class DuplicationScanner:
     def _detect_oss_patterns(self, code: str, filename: str) -> List[Dict[str, Any]]:
         """Detect potentially copied OSS code"""
         findings = []
+        normalized = self._normalize_code(code)
         
         for pattern in self.known_oss_patterns:
-            similarity = self._calculate_similarity(code, pattern['snippet'])
+            similarity = _similar_above(normalized, pattern['normalized'], 0.75)
             
             if similarity > 0.75:  # 75% match with known OSS
                 findings.append({
@@ -119,9 +145,9 @@ class DuplicationScanner:
             if not clean_line or clean_line.startswith('#'):
                 continue
             
-            # Normalize line (remove variable names)
-            normalized = self._normalize_line(clean_line)
-            line_hash = hashlib.md5(normalized.encode()).hexdigest()
+            # Normalize line (remove variable names); the normalized text
+            # is its own dict key - no need to digest it first
+            line_hash = self._normalize_line(clean_line)
             
             if line_hash in line_hashes:
                 line_hashes[line_hash].append(i)
@@ -182,40 +208,31 @@ class DuplicationScanner:
         
         return blocks
     
-    def _calculate_similarity(self, code1: str, code2: str) -> float:
-        """Calculate similarity ratio between two code snippets"""
-        # Normalize both snippets
-        norm1 = self._normalize_code(code1)
-        norm2 = self._normalize_code(code2)
-        
-        # Use SequenceMatcher for similarity
-        return SequenceMatcher(None, norm1, norm2).ratio()
-    
     def _normalize_code(self, code: str) -> str:
         """Normalize code for comparison (remove variable names, etc.)"""
         # Remove comments
-        code = re.sub(r'#.*$', '', code, flags=re.MULTILINE)
+        code = _COMMENT_RE.sub('', code)
         
         # Remove extra whitespace
-        code = re.sub(r'\s+', ' ', code)
+        code = _WHITESPACE_RE.sub(' ', code)
         
         # Remove string literals (keep structure)
-        code = re.sub(r'"[^"]*"', '""', code)
-        code = re.sub(r"'[^']*'", "''", code)
+        code = _DOUBLE_QUOTED_RE.sub('""', code)
+        code = _SINGLE_QUOTED_RE.sub("''", code)
         
         return code.strip()
     
     def _normalize_line(self, line: str) -> str:
         """Normalize a single line for pattern matching"""
         # Replace variable names with placeholders
-        line = re.sub(r'\b[a-z_][a-z0-9_]*\b', 'VAR', line)
+        line = _IDENTIFIER_RE.sub('VAR', line)
         
         # Replace numbers with placeholder
-        line = re.sub(r'\b\d+\b', 'NUM', line)
+        line = _NUMBER_RE.sub('NUM', line)
         
         # Replace strings with placeholder
-        line = re.sub(r'"[^"]*"', 'STR', line)
-        line = re.sub(r"'[^']*'", 'STR', line)
+        line = _DOUBLE_QUOTED_RE.sub('STR', line)
+        line = _SINGLE_QUOTED_RE.sub('STR', line)
         
         return line
 
@@ -5,84 +5,349 @@ Records all violations, actions, and resolutions for compliance
 
 import json
 import csv
-from datetime import datetime
-from typing import List, Dict, Any, Optional
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Any, Optional, Tuple
 from pathlib import Path
 import sqlite3
+import threading
+import zlib
+from collections import Counter, deque
 from contextlib import contextmanager
 
+try:
+    import orjson
+except ImportError:  # optional; stdlib json produces the same document
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+DAY_MS = 86400000
+
+_EPOCH = datetime(1970, 1, 1)
+
+# Most log_scan rows written per group commit
+GROUP_COMMIT_MAX = 100
+
+# How long a get_statistics result is reused when no scans are written
+STATS_CACHE_TTL_SECONDS = 60
+
+# audit_logs layout version, kept in PRAGMA user_version. Databases from
+# before versioning (0) are rebuilt in place by _migrate_audit_logs
+SCHEMA_VERSION = 1
+
+_CREATE_AUDIT_LOGS_SQL = '''
+    CREATE TABLE IF NOT EXISTS audit_logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp INTEGER NOT NULL,
+        scan_id TEXT NOT NULL,
+        repository TEXT,
+        file_path TEXT,
+        language TEXT,
+        total_violations INTEGER,
+        critical_count INTEGER,
+        high_count INTEGER,
+        medium_count INTEGER,
+        low_count INTEGER,
+        policy_mode TEXT,
+        action_taken TEXT,
+        blocked BOOLEAN,
+        copilot_detected BOOLEAN,
+        duration_seconds REAL,
+        user_id TEXT,
+        pr_number INTEGER,
+        violations_blob BLOB,
+        resolution_state TEXT,
+        override_approved BOOLEAN,
+        override_approver TEXT,
+        notes TEXT
+    )
+'''
+
+# Columns copied as-is when an old audit_logs table is migrated
+_CARRIED_COLUMNS = (
+    'id', 'timestamp', 'scan_id', 'repository', 'file_path', 'language',
+    'total_violations', 'critical_count', 'high_count', 'medium_count', 'low_count',
+    'policy_mode', 'action_taken', 'blocked', 'copilot_detected', 'duration_seconds',
+    'user_id', 'pr_number', 'resolution_state', 'override_approved',
+    'override_approver', 'notes'
+)
+
+# Flags one scan's violations of a type as fixed, in place
+_MARK_FIXED_SQL = '''
+    UPDATE audit_logs
+    SET violations_blob = deflate_violations((
+        SELECT json_group_array(
+            CASE WHEN COALESCE(json_extract(j.value, '$.type'), 'unknown') = ?
+                 THEN json_set(j.value, '$.fixed', 1, '$.fix_timestamp', ?)
+                 ELSE json(j.value)
+            END
+        )
+        FROM json_each(inflate_violations(audit_logs.violations_blob)) j
+    ))
+    WHERE id = ?
+'''
+
+_INSERT_SCAN_SQL = '''
+    INSERT INTO audit_logs (
+        timestamp, scan_id, repository, file_path, language,
+        total_violations, critical_count, high_count, medium_count, low_count,
+        policy_mode, action_taken, blocked, copilot_detected,
+        duration_seconds, user_id, pr_number, violations_blob,
+        resolution_state, override_approved
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+# Scan history columns in their original order, split around the
+# violations; timestamps and violations go out as the ISO-8601 and JSON
+# text callers have always received
+_HISTORY_COLUMNS_HEAD = (
+    'id, iso_timestamp(timestamp) AS timestamp, scan_id, repository, file_path, language, '
+    'total_violations, critical_count, high_count, medium_count, low_count, '
+    'policy_mode, action_taken, blocked, copilot_detected, duration_seconds, '
+    'user_id, pr_number'
+)
+_HISTORY_VIOLATIONS = 'inflate_violations(violations_blob) AS violations_json'
+_HISTORY_COLUMNS_TAIL = 'resolution_state, override_approved, override_approver, notes'
+
+
+
+def _now_ms() -> int:
+    """Current UTC time as epoch milliseconds"""
+    return int(time.time() * 1000)
+
+
+def _to_epoch_ms(value: str) -> int:
+    """ISO-8601 date/datetime to epoch milliseconds (naive means UTC)"""
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp() * 1000)
+
+
+def _to_iso(epoch_ms: int) -> str:
+    """Epoch milliseconds to naive-UTC ISO-8601, the format rows were written in"""
+    return (_EPOCH + timedelta(milliseconds=epoch_ms)).isoformat()
+
+
+def _epoch_ms_sql(value):
+    """SQL function: migrated timestamp (ISO text or epoch ms) to epoch ms"""
+    if value is None or isinstance(value, int):
+        return value
+    return _to_epoch_ms(value)
+
+
+def _iso_sql(epoch_ms: Optional[int]) -> Optional[str]:
+    """SQL function: stored epoch ms to ISO-8601 text for reads and exports"""
+    return _to_iso(epoch_ms) if epoch_ms is not None else None
+
+
+def _pack_violations(violations: List[Dict[str, Any]]) -> bytes:
+    """Violations list to a zlib-compressed JSON blob"""
+    if orjson is not None:
+        data = orjson.dumps(violations)
+    else:
+        data = json.dumps(violations).encode('utf-8')
+    return zlib.compress(data, 1)
+
+
+def _dumps(obj: Any) -> bytes:
+    """Indented JSON document as bytes, via orjson when available"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    return json.dumps(obj, indent=2).encode('utf-8')
+
+
+def _history_query(
+    repository: Optional[str],
+    start_date: Optional[str],
+    end_date: Optional[str],
+    limit: int,
+    include_violations: bool
+):
+    """SELECT over audit_logs with the scan-history filters applied"""
+    if include_violations:
+        columns = f'{_HISTORY_COLUMNS_HEAD}, {_HISTORY_VIOLATIONS}, {_HISTORY_COLUMNS_TAIL}'
+    else:
+        columns = f'{_HISTORY_COLUMNS_HEAD}, {_HISTORY_COLUMNS_TAIL}'
+    query = f'SELECT {columns} FROM audit_logs WHERE 1=1'
+    params = []
+    
+    if repository:
+        query += ' AND repository = ?'
+        params.append(repository)
+    
+    if start_date:
+        query += ' AND audit_logs.timestamp >= ?'
+        params.append(_to_epoch_ms(start_date))
+    
+    if end_date:
+        query += ' AND audit_logs.timestamp <= ?'
+        params.append(_to_epoch_ms(end_date))
+    
+    query += ' ORDER BY audit_logs.timestamp DESC LIMIT ?'
+    params.append(limit)
+    return query, params
+
+
+def _inflate_sql(blob: Optional[bytes]) -> Optional[str]:
+    """SQL function: violations blob to JSON text for json_each"""
+    return zlib.decompress(blob).decode('utf-8') if blob is not None else None
+
+
+def _deflate_sql(text: Optional[str]) -> Optional[bytes]:
+    """SQL function: JSON text back to a violations blob"""
+    return zlib.compress(text.encode('utf-8'), 1) if text is not None else None
+
 
 class AuditLogger:
     """Audit logging for compliance and traceability"""
     
     def __init__(self, db_path: str = "audit_logs.db"):
         self.db_path = db_path
+        # One long-lived connection per thread, reused across calls
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        # log_scan group commit: one queue and flusher task per event loop
+        self._flushers: Dict[asyncio.AbstractEventLoop, Tuple[asyncio.Queue, asyncio.Task]] = {}
+        # get_statistics results per (repository, days); any insert bumps
+        # the generation so stale aggregates are never stored or served
+        self._stats_cache: Dict[Tuple[Optional[str], int], Tuple[Dict[str, Any], float]] = {}
+        self._stats_generation = 0
         self._init_database()
     
     def _init_database(self):
         """Initialize SQLite database for audit logs"""
         with self._get_connection() as conn:
-            conn.execute('''
-                CREATE TABLE IF NOT EXISTS audit_logs (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp TEXT NOT NULL,
-                    scan_id TEXT NOT NULL,
-                    repository TEXT,
-                    file_path TEXT,
-                    language TEXT,
-                    total_violations INTEGER,
-                    critical_count INTEGER,
-                    high_count INTEGER,
-                    medium_count INTEGER,
-                    low_count INTEGER,
-                    policy_mode TEXT,
-                    action_taken TEXT,
-                    blocked BOOLEAN,
-                    copilot_detected BOOLEAN,
-                    duration_seconds REAL,
-                    user_id TEXT,
-                    pr_number INTEGER,
-                    violations_json TEXT,
-                    resolution_state TEXT,
-                    override_approved BOOLEAN,
-                    override_approver TEXT,
-                    notes TEXT
-                )
-            ''')
+            # WAL is persistent in the database file: one fsync per commit
+            # and readers no longer block the writer
+            conn.execute('PRAGMA journal_mode=WAL')
             
-            conn.execute('''
-                CREATE TABLE IF NOT EXISTS violation_details (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    audit_log_id INTEGER,
-                    violation_type TEXT,
-                    severity TEXT,
-                    line_number INTEGER,
-                    source TEXT,
-                    message TEXT,
-                    cwe TEXT,
-                    owasp TEXT,
-                    fixed BOOLEAN DEFAULT 0,
-                    fix_timestamp TEXT,
-                    FOREIGN KEY (audit_log_id) REFERENCES audit_logs(id)
+            version = conn.execute('PRAGMA user_version').fetchone()[0]
+            if version > SCHEMA_VERSION:
+                raise RuntimeError(
+                    f"{self.db_path} uses audit schema v{version}; "
+                    f"this version only understands up to v{SCHEMA_VERSION}"
                 )
-            ''')
+            if version < SCHEMA_VERSION:
+                columns = {row['name'] for row in conn.execute('PRAGMA table_info(audit_logs)')}
+                if columns:
+                    self._migrate_audit_logs(conn, columns)
+            
+            conn.execute(_CREATE_AUDIT_LOGS_SQL)
             
             # Create indices for better query performance
             conn.execute('CREATE INDEX IF NOT EXISTS idx_timestamp ON audit_logs(timestamp)')
             conn.execute('CREATE INDEX IF NOT EXISTS idx_repository ON audit_logs(repository)')
-            conn.execute('CREATE INDEX IF NOT EXISTS idx_severity ON violation_details(severity)')
+            # Covers every column get_statistics/get_violation_trends read,
+            # so those aggregates never touch the table itself
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_stats_cover ON audit_logs(
+                    repository, timestamp, total_violations,
+                    critical_count, high_count, medium_count, low_count,
+                    duration_seconds, blocked, copilot_detected
+                )
+            ''')
             
+            conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
             conn.commit()
     
+    def _migrate_audit_logs(self, conn: sqlite3.Connection, columns: set):
+        """
+        Rebuild an unversioned audit_logs table in the current layout
+        ISO text timestamps become epoch ms, violations_json text is
+        recompressed into violations_blob, and fixed flags from the retired
+        violation_details table are folded into it.
+        Runs in one transaction, so a failure leaves the old table intact
+        """
+        conn.execute('BEGIN')
+        conn.execute('ALTER TABLE audit_logs RENAME TO audit_logs_old')
+        # Indices follow the renamed table; free their names for the new one
+        for index in ('idx_timestamp', 'idx_repository', 'idx_stats_cover'):
+            conn.execute(f'DROP INDEX IF EXISTS {index}')
+        conn.execute(_CREATE_AUDIT_LOGS_SQL)
+        
+        if 'violations_blob' in columns:
+            violations = 'violations_blob'
+        elif 'violations_json' in columns:
+            violations = 'deflate_violations(violations_json)'
+        else:
+            violations = 'NULL'
+        selected = [c if c in columns else 'NULL' for c in _CARRIED_COLUMNS]
+        # Pre-versioning rows hold ISO-8601 text timestamps
+        selected[_CARRIED_COLUMNS.index('timestamp')] = 'epoch_ms(timestamp)'
+        conn.execute(f'''
+            INSERT INTO audit_logs ({', '.join(_CARRIED_COLUMNS)}, violations_blob)
+            SELECT {', '.join(selected)}, {violations} FROM audit_logs_old
+        ''')
+        
+        has_details = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'violation_details'"
+        ).fetchone()
+        if has_details:
+            fixed = conn.execute('''
+                SELECT violation_type, MAX(fix_timestamp), audit_log_id
+                FROM violation_details
+                WHERE fixed
+                GROUP BY audit_log_id, violation_type
+            ''').fetchall()
+            for violation_type, fix_timestamp, audit_log_id in fixed:
+                conn.execute(_MARK_FIXED_SQL, (violation_type or 'unknown', fix_timestamp, audit_log_id))
+            conn.execute('DROP TABLE violation_details')
+        
+        conn.execute('DROP TABLE audit_logs_old')
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Open and tune a new connection"""
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        
+        # Connection-scoped tuning (WAL itself is set in _init_database)
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        conn.execute('PRAGMA cache_size=-64000')
+        conn.execute('PRAGMA mmap_size=268435456')
+        
+        # Violations are stored compressed; these let SQL's JSON1
+        # functions read and rewrite them in place
+        conn.create_function('inflate_violations', 1, _inflate_sql, deterministic=True)
+        conn.create_function('deflate_violations', 1, _deflate_sql, deterministic=True)
+        # Timestamps are stored as epoch ms and read back as ISO text
+        conn.create_function('epoch_ms', 1, _epoch_ms_sql, deterministic=True)
+        conn.create_function('iso_timestamp', 1, _iso_sql, deterministic=True)
+        
+        with self._connections_lock:
+            self._connections.append(conn)
+        return conn
+    
     @contextmanager
     def _get_connection(self):
-        """Context manager for database connections"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
+        """Context manager yielding this thread's pooled connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
         try:
             yield conn
-        finally:
-            conn.close()
+        except Exception:
+            # Don't leave a half-done transaction on a reused connection
+            conn.rollback()
+            raise
+    
+    def close(self):
+        """Stop the group-commit flushers and close every pooled connection"""
+        for loop, (_, task) in list(self._flushers.items()):
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(task.cancel)
+        self._flushers.clear()
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
     
     async def log_scan(
         self,
@@ -103,70 +368,158 @@ class AuditLogger:
         Returns:
             audit_log_id: ID of the created audit log entry
         """
-        # Count violations by severity
-        severity_counts = {'critical': 0, 'high': 0, 'medium': 0, 'low': 0}
+        row, violations = self._scan_row(
+            scan_id, repository, file_path, language, violations,
+            policy_action, duration, copilot_detected, user_id, pr_number
+        )
+        
+        # Group commit: the flusher writes everything queued meanwhile in
+        # one transaction and resolves each caller with its row id
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._ensure_flusher(loop).put_nowait((row, violations, future))
+        return await future
+    
+    @staticmethod
+    def _scan_row(
+        scan_id: str,
+        repository: str,
+        file_path: str,
+        language: str,
+        violations: List[Dict[str, Any]],
+        policy_action: Dict[str, Any],
+        duration: float,
+        copilot_detected: bool = False,
+        user_id: Optional[str] = None,
+        pr_number: Optional[int] = None
+    ) -> Tuple[tuple, List[Dict[str, Any]]]:
+        """audit_logs column values for a scan, plus its deduplicated violations"""
+        # Overlapping rules/scanners report the same finding more than once;
+        # keep the first of each so counts and stored rows are real issues
+        unique = {}
         for v in violations:
-            severity = v.get('severity', 'low')
-            if severity in severity_counts:
-                severity_counts[severity] += 1
+            unique.setdefault(
+                (v.get('type'), v.get('line', 0), v.get('source'), v.get('message', '')), v
+            )
+        violations = list(unique.values())
+        
+        # Count violations by severity (unknown severities are dropped)
+        counts = Counter(v.get('severity', 'low') for v in violations)
+        severity_counts = {k: counts.get(k, 0) for k in ('critical', 'high', 'medium', 'low')}
+        
+        row = (
+            _now_ms(),
+            scan_id,
+            repository,
+            file_path,
+            language,
+            len(violations),
+            severity_counts['critical'],
+            severity_counts['high'],
+            severity_counts['medium'],
+            severity_counts['low'],
+            policy_action.get('mode', 'unknown'),
+            policy_action.get('reason', ''),
+            policy_action.get('should_block', False),
+            copilot_detected,
+            duration,
+            user_id,
+            pr_number
+        )
+        return row, violations
+    
+    def _ensure_flusher(self, loop: asyncio.AbstractEventLoop) -> asyncio.Queue:
+        """Pending-write queue for this event loop, starting its flusher"""
+        entry = self._flushers.get(loop)
+        if entry is None or entry[1].done():
+            queue = asyncio.Queue()
+            task = loop.create_task(self._flush_pending(queue))
+            task.add_done_callback(lambda t: self._forget_flusher(loop, t))
+            entry = self._flushers[loop] = (queue, task)
+        return entry[0]
+    
+    def _forget_flusher(self, loop: asyncio.AbstractEventLoop, task: asyncio.Task):
+        """Drop a stopped flusher so its (possibly closed) loop isn't kept alive"""
+        entry = self._flushers.get(loop)
+        if entry is not None and entry[1] is task:
+            del self._flushers[loop]
+    
+    async def _flush_pending(self, queue: asyncio.Queue):
+        """Drain queued log_scan writes, one commit per batch"""
+        try:
+            while True:
+                await self._flush_batch(queue)
+        except asyncio.CancelledError:
+            # The loop is shutting down (or close() was called): write
+            # whatever is still queued so no caller's scan is dropped
+            leftover = []
+            while not queue.empty():
+                leftover.append(queue.get_nowait())
+            if leftover:
+                try:
+                    ids = self._insert_scans([(row, violations) for row, violations, _ in leftover])
+                except Exception as e:
+                    for _, _, future in leftover:
+                        if not future.done():
+                            future.set_exception(e)
+                else:
+                    for (_, _, future), audit_log_id in zip(leftover, ids):
+                        if not future.done():
+                            future.set_result(audit_log_id)
+            raise
+    
+    async def _flush_batch(self, queue: asyncio.Queue):
+        """Write the next batch of queued scans and resolve their callers"""
+        batch = [await queue.get()]
+        # Whatever queued up while the previous batch was being
+        # written goes out together
+        while len(batch) < GROUP_COMMIT_MAX and not queue.empty():
+            batch.append(queue.get_nowait())
         
-        timestamp = datetime.utcnow().isoformat()
+        try:
+            ids = await asyncio.to_thread(
+                self._insert_scans, [(row, violations) for row, violations, _ in batch]
+            )
+        except Exception as e:
+            if len(batch) == 1:
+                if not batch[0][2].done():
+                    batch[0][2].set_exception(e)
+                return
+            # One bad row rolled back the batch; retry individually
+            # so only its own caller sees the error
+            for row, violations, future in batch:
+                try:
+                    ids = await asyncio.to_thread(self._insert_scans, [(row, violations)])
+                except Exception as e:
+                    if not future.done():
+                        future.set_exception(e)
+                else:
+                    if not future.done():
+                        future.set_result(ids[0])
+            return
         
+        for (_, _, future), audit_log_id in zip(batch, ids):
+            if not future.done():
+                future.set_result(audit_log_id)
+    
+    def _insert_scans(self, scans: List[tuple]) -> List[int]:
+        """Insert queued scans in a single transaction; returns row ids"""
+        ids = []
         with self._get_connection() as conn:
-            cursor = conn.execute('''
-                INSERT INTO audit_logs (
-                    timestamp, scan_id, repository, file_path, language,
-                    total_violations, critical_count, high_count, medium_count, low_count,
-                    policy_mode, action_taken, blocked, copilot_detected,
-                    duration_seconds, user_id, pr_number, violations_json,
-                    resolution_state, override_approved
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                timestamp,
-                scan_id,
-                repository,
-                file_path,
-                language,
-                len(violations),
-                severity_counts['critical'],
-                severity_counts['high'],
-                severity_counts['medium'],
-                severity_counts['low'],
-                policy_action.get('mode', 'unknown'),
-                policy_action.get('reason', ''),
-                policy_action.get('should_block', False),
-                copilot_detected,
-                duration,
-                user_id,
-                pr_number,
-                json.dumps(violations),
-                'open',
-                False
-            ))
-            
-            audit_log_id = cursor.lastrowid
-            
-            # Log individual violation details
-            for violation in violations:
-                conn.execute('''
-                    INSERT INTO violation_details (
-                        audit_log_id, violation_type, severity, line_number,
-                        source, message, cwe, owasp
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    audit_log_id,
-                    violation.get('type', 'unknown'),
-                    violation.get('severity', 'low'),
-                    violation.get('line', 0),
-                    violation.get('source', 'unknown'),
-                    violation.get('message', ''),
-                    violation.get('cwe', ''),
-                    violation.get('owasp', '')
+            for row, violations in scans:
+                cursor = conn.execute(_INSERT_SCAN_SQL, (
+                    *row,
+                    _pack_violations(violations),
+                    'open',
+                    False
                 ))
+                ids.append(cursor.lastrowid)
             
             conn.commit()
         
-        return audit_log_id
+        self._stats_generation += 1
+        self._stats_cache.clear()
+        return ids
     
     async def update_resolution(
         self,
@@ -177,65 +530,72 @@ class AuditLogger:
         notes: Optional[str] = None
     ):
         """Update the resolution state of a scan"""
-        with self._get_connection() as conn:
-            conn.execute('''
-                UPDATE audit_logs
-                SET resolution_state = ?,
-                    override_approved = ?,
-                    override_approver = ?,
-                    notes = ?
-                WHERE scan_id = ?
-            ''', (resolution_state, override_approved, override_approver, notes, scan_id))
-            conn.commit()
+        def _impl():
+            with self._get_connection() as conn:
+                conn.execute('''
+                    UPDATE audit_logs
+                    SET resolution_state = ?,
+                        override_approved = ?,
+                        override_approver = ?,
+                        notes = ?
+                    WHERE scan_id = ?
+                ''', (resolution_state, override_approved, override_approver, notes, scan_id))
+                conn.commit()
+        
+        await asyncio.to_thread(_impl)
     
     async def mark_violation_fixed(self, audit_log_id: int, violation_type: str):
         """Mark a specific violation as fixed"""
-        timestamp = datetime.utcnow().isoformat()
+        timestamp = _to_iso(_now_ms())
         
-        with self._get_connection() as conn:
-            conn.execute('''
-                UPDATE violation_details
-                SET fixed = 1, fix_timestamp = ?
-                WHERE audit_log_id = ? AND violation_type = ?
-            ''', (timestamp, audit_log_id, violation_type))
-            conn.commit()
+        def _impl():
+            with self._get_connection() as conn:
+                # Violations live only in violations_blob; flag matching
+                # entries in place with json_set
+                conn.execute(_MARK_FIXED_SQL, (violation_type, timestamp, audit_log_id))
+                conn.commit()
+        
+        await asyncio.to_thread(_impl)
     
     async def get_scan_history(
         self,
         repository: Optional[str] = None,
         start_date: Optional[str] = None,
         end_date: Optional[str] = None,
-        limit: int = 100
+        limit: int = 100,
+        include_violations: bool = True
     ) -> List[Dict[str, Any]]:
-        """Get scan history with optional filters"""
-        query = 'SELECT * FROM audit_logs WHERE 1=1'
-        params = []
-        
-        if repository:
-            query += ' AND repository = ?'
-            params.append(repository)
-        
-        if start_date:
-            query += ' AND timestamp >= ?'
-            params.append(start_date)
-        
-        if end_date:
-            query += ' AND timestamp <= ?'
-            params.append(end_date)
-        
-        query += ' ORDER BY timestamp DESC LIMIT ?'
-        params.append(limit)
+        """
+        Get scan history with optional filters
+        include_violations=False leaves out violations_json, skipping the
+        decompression for callers that only need the scan rows
+        """
+        query, params = _history_query(
+            repository, start_date, end_date, limit, include_violations
+        )
         
-        with self._get_connection() as conn:
-            rows = conn.execute(query, params).fetchall()
+        def _impl():
+            with self._get_connection() as conn:
+                rows = conn.execute(query, params).fetchall()
             return [dict(row) for row in rows]
+        
+        return await asyncio.to_thread(_impl)
     
     async def get_statistics(
         self,
         repository: Optional[str] = None,
         days: int = 30
     ) -> Dict[str, Any]:
-        """Get aggregate statistics"""
+        """
+        Get aggregate statistics
+        Results are cached for STATS_CACHE_TTL_SECONDS and dropped as soon
+        as a scan is logged
+        """
+        key = (repository, days)
+        cached = self._stats_cache.get(key)
+        if cached is not None and cached[1] > time.monotonic():
+            return dict(cached[0])
+        
         query = '''
             SELECT 
                 COUNT(*) as total_scans,
@@ -248,17 +608,24 @@ class AuditLogger:
                 SUM(CASE WHEN blocked THEN 1 ELSE 0 END) as blocked_scans,
                 SUM(CASE WHEN copilot_detected THEN 1 ELSE 0 END) as copilot_scans
             FROM audit_logs
-            WHERE timestamp >= datetime('now', '-' || ? || ' days')
+            WHERE timestamp >= ?
         '''
-        params = [days]
+        params = [_now_ms() - days * DAY_MS]
         
         if repository:
             query += ' AND repository = ?'
             params.append(repository)
         
-        with self._get_connection() as conn:
-            row = conn.execute(query, params).fetchone()
-            return dict(row) if row else {}
+        def _impl():
+            with self._get_connection() as conn:
+                row = conn.execute(query, params).fetchone()
+                return dict(row) if row else {}
+        
+        generation = self._stats_generation
+        stats = await asyncio.to_thread(_impl)
+        if generation == self._stats_generation:
+            self._stats_cache[key] = (stats, time.monotonic() + STATS_CACHE_TTL_SECONDS)
+        return dict(stats)
     
     async def export_to_csv(
         self,
@@ -267,19 +634,25 @@ class AuditLogger:
         start_date: Optional[str] = None,
         end_date: Optional[str] = None
     ) -> str:
-        """Export audit logs to CSV file"""
-        scans = await self.get_scan_history(repository, start_date, end_date, limit=10000)
+        """
+        Export audit logs to CSV file
+        Rows stream from the cursor straight to disk
+        """
+        query, params = _history_query(repository, start_date, end_date, 10000, True)
         
-        with open(output_path, 'w', newline='') as csvfile:
-            if not scans:
-                return output_path
-            
-            fieldnames = scans[0].keys()
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            
-            writer.writeheader()
-            writer.writerows(scans)
+        def _write():
+            with self._get_connection() as conn, open(output_path, 'w', newline='') as csvfile:
+                cursor = conn.execute(query, params)
+                writer = csv.writer(csvfile)
+                
+                header_written = False
+                for row in cursor:
+                    if not header_written:
+                        writer.writerow([d[0] for d in cursor.description])
+                        header_written = True
+                    writer.writerow(row)
         
+        await asyncio.to_thread(_write)
         return output_path
     
     async def export_to_json(
@@ -289,12 +662,23 @@ class AuditLogger:
         start_date: Optional[str] = None,
         end_date: Optional[str] = None
     ) -> str:
-        """Export audit logs to JSON file"""
-        scans = await self.get_scan_history(repository, start_date, end_date, limit=10000)
+        """
+        Export audit logs to JSON file
+        The array is framed by hand so only one row is in memory at a time
+        """
+        query, params = _history_query(repository, start_date, end_date, 10000, True)
         
-        with open(output_path, 'w') as jsonfile:
-            json.dump(scans, jsonfile, indent=2)
+        def _write():
+            with self._get_connection() as conn, open(output_path, 'wb') as jsonfile:
+                jsonfile.write(b'[')
+                sep = b'\n'
+                for row in conn.execute(query, params):
+                    jsonfile.write(sep)
+                    jsonfile.write(_dumps(dict(row)))
+                    sep = b',\n'
+                jsonfile.write(b'\n]\n')
         
+        await asyncio.to_thread(_write)
         return output_path
     
     async def get_violation_trends(
@@ -305,7 +689,7 @@ class AuditLogger:
         """Get violation trends over time"""
         query = '''
             SELECT 
-                date(timestamp) as date,
+                date(timestamp / 86400000 * 86400, 'unixepoch') as date,
                 COUNT(*) as scan_count,
                 SUM(total_violations) as violation_count,
                 SUM(critical_count) as critical,
@@ -313,19 +697,23 @@ class AuditLogger:
                 SUM(medium_count) as medium,
                 SUM(low_count) as low
             FROM audit_logs
-            WHERE timestamp >= datetime('now', '-' || ? || ' days')
+            WHERE timestamp >= ?
         '''
-        params = [days]
+        params = [_now_ms() - days * DAY_MS]
         
         if repository:
             query += ' AND repository = ?'
             params.append(repository)
         
-        query += ' GROUP BY date(timestamp) ORDER BY date'
+        # Integer day buckets instead of parsing a date per row
+        query += ' GROUP BY timestamp / 86400000 ORDER BY date'
         
-        with self._get_connection() as conn:
-            rows = conn.execute(query, params).fetchall()
-            return {'trends': [dict(row) for row in rows]}
+        def _impl():
+            with self._get_connection() as conn:
+                rows = conn.execute(query, params).fetchall()
+                return {'trends': [dict(row) for row in rows]}
+        
+        return await asyncio.to_thread(_impl)
     
     async def get_top_violations(
         self,
@@ -333,14 +721,14 @@ class AuditLogger:
         limit: int = 10
     ) -> List[Dict[str, Any]]:
         """Get most common violation types"""
+        # Unroll the stored violation arrays at query time
         query = '''
             SELECT 
-                v.violation_type,
-                v.severity,
+                COALESCE(json_extract(j.value, '$.type'), 'unknown') as violation_type,
+                COALESCE(json_extract(j.value, '$.severity'), 'low') as severity,
                 COUNT(*) as count,
-                SUM(CASE WHEN v.fixed THEN 1 ELSE 0 END) as fixed_count
-            FROM violation_details v
-            JOIN audit_logs a ON v.audit_log_id = a.id
+                SUM(CASE WHEN json_extract(j.value, '$.fixed') THEN 1 ELSE 0 END) as fixed_count
+            FROM audit_logs a, json_each(inflate_violations(a.violations_blob)) j
             WHERE 1=1
         '''
         params = []
@@ -349,12 +737,119 @@ class AuditLogger:
             query += ' AND a.repository = ?'
             params.append(repository)
         
-        query += ' GROUP BY v.violation_type, v.severity ORDER BY count DESC LIMIT ?'
+        query += ' GROUP BY violation_type, severity ORDER BY count DESC LIMIT ?'
         params.append(limit)
         
-        with self._get_connection() as conn:
-            rows = conn.execute(query, params).fetchall()
-            return [dict(row) for row in rows]
+        def _impl():
+            with self._get_connection() as conn:
+                rows = conn.execute(query, params).fetchall()
+                return [dict(row) for row in rows]
+        
+        return await asyncio.to_thread(_impl)
+
+
+class BufferedAuditLogger:
+    """
+    Write-behind buffer in front of an AuditLogger
+    Rows are written in one transaction when max_entries are pending, after
+    flush_interval seconds, or on an explicit flush(). log_scan keeps
+    AuditLogger's signature and returns the row ID once written;
+    enqueue_scan returns a future for it without waiting. Other AuditLogger
+    methods pass straight through
+    
+    The buffer holds futures of the loop that queued them, so an instance
+    must only be used from a single event loop
+    """
+    
+    def __init__(self, audit_logger: AuditLogger, max_entries: int = 256, flush_interval: float = 1.0):
+        self._logger = audit_logger
+        self.max_entries = max_entries
+        self.flush_interval = flush_interval
+        self._buffer: deque = deque()
+        self._timer: Optional[asyncio.Task] = None
+        self._tasks: set = set()
+    
+    def __getattr__(self, name):
+        return getattr(self._logger, name)
+    
+    async def log_scan(self, *args, **kwargs) -> int:
+        """
+        Log a scan through the buffer (same arguments as AuditLogger.log_scan)
+        
+        Returns:
+            audit_log_id: ID of the created audit log entry
+        """
+        return await self.enqueue_scan(*args, **kwargs)
+    
+    def enqueue_scan(self, *args, **kwargs) -> asyncio.Future:
+        """
+        Queue a scan without waiting for it to be written
+        
+        Returns:
+            Future resolving to the audit_log_id once the row is written
+        """
+        row, violations = AuditLogger._scan_row(*args, **kwargs)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        
+        self._buffer.append((row, violations, future))
+        
+        if len(self._buffer) >= self.max_entries:
+            self._spawn(self._flush_background())
+        elif self._timer is None or self._timer.done():
+            self._timer = self._spawn(self._flush_later())
+        
+        return future
+    
+    async def log_scan_batch(self, scans: List[Dict[str, Any]]) -> List[int]:
+        """Queue several scans (log_scan keyword dicts), flush, return their IDs"""
+        futures = [self.enqueue_scan(**scan) for scan in scans]
+        await self.flush()
+        return list(await asyncio.gather(*futures))
+    
+    async def get_statistics(self, *args, **kwargs) -> Dict[str, Any]:
+        """Aggregate statistics including scans still in the buffer"""
+        await self.flush()
+        return await self._logger.get_statistics(*args, **kwargs)
+    
+    async def flush(self):
+        """Write every buffered scan in a single transaction"""
+        batch = list(self._buffer)
+        self._buffer.clear()
+        if not batch:
+            return
+        
+        try:
+            ids = await asyncio.to_thread(
+                self._logger._insert_scans, [(row, violations) for row, violations, _ in batch]
+            )
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            raise
+        
+        for (_, _, future), audit_log_id in zip(batch, ids):
+            if not future.done():
+                future.set_result(audit_log_id)
+    
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_interval)
+        await self._flush_background()
+    
+    async def _flush_background(self):
+        """flush() for background tasks; waiters already got any error"""
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Buffered audit flush failed: {e}")
+    
+    def _spawn(self, coro) -> asyncio.Task:
+        """Background task kept alive until it finishes"""
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
 
 
 # Singleton instance
@@ -3,62 +3,33 @@ Production Gemini AI Analyzer
 Uses chain-of-thought, few-shot learning, structured outputs
 """
 import google.generativeai as genai
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple, AsyncIterator
+from collections import OrderedDict
 import logging
 import json
 import asyncio
+import hashlib
+import time
 import re
 
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:  # orjson is optional; stdlib json is a drop-in here
+    _json_loads = json.loads
+
 logger = logging.getLogger(__name__)
 
-class GeminiAnalyzer:
-    """Advanced AI security analyzer"""
-    
-    def __init__(self, api_key: str):
-        if not api_key:
-            raise ValueError("API key required")
-        
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel(
-            'gemini-1.5-pro',
-            generation_config={
-                "temperature": 0.1,
-                "top_p": 0.95,
-                "max_output_tokens": 8192,
-            }
-        )
-        logger.info("✅ Gemini initialized")
-    
-    async def analyze_security(self, code: str, filename: str, language: str, context: Optional[Dict] = None) -> List[Dict]:
-        """Deep AI security analysis"""
-        try:
-            # Build sophisticated prompt
-            prompt = self._build_prompt(code, filename, language, context)
-            
-            # Call Gemini
-            response = await asyncio.to_thread(self.model.generate_content, prompt)
-            
-            # Parse and validate
-            vulns = self._parse_response(response.text)
-            
-            # Enrich
-            enriched = self._enrich(vulns, filename, language)
-            
-            logger.info(f"✅ AI found {len(enriched)} issues in {filename}")
-            return enriched
-            
-        except Exception as e:
-            logger.error(f"❌ AI analysis failed: {e}")
-            return []
-    
-    def _build_prompt(self, code: str, filename: str, language: str, context: Optional[Dict]) -> str:
-        """Advanced prompt with chain-of-thought"""
-        
-        # Truncate if needed
-        if len(code) > 6000:
-            code = code[:3000] + "\n\n... [code truncated] ...\n\n" + code[-3000:]
-        
-        prompt = f"""You are a senior security engineer auditing code.
+# Cached analyses are reused for identical (code, file, language, context)
+CACHE_TTL_SECONDS = 3600
+CACHE_MAX_ENTRIES = 1024
+
+# Code budget for one analyze_batch prompt (files are truncated to ~6000
+# chars each, so this packs roughly four files per request)
+BATCH_MAX_CHARS = 24000
+
+# Built once; _build_prompt only fills the holes
+_SECURITY_PROMPT = """You are a senior security engineer auditing code.
 
 # ANALYSIS TASK
 Perform deep security analysis on this {language} code.
@@ -66,15 +37,8 @@ Perform deep security analysis on this {language} code.
 # FILE CONTEXT
 - File: {filename}
 - Language: {language}
-- Lines: {len(code.split(chr(10)))}
-"""
-        
-        if context:
-            if context.get('copilot_detected'):
-                prompt += f"\n⚠️  AI-GENERATED CODE DETECTED - Apply extra scrutiny!\n"
-            prompt += f"- Repository: {context.get('repository', 'N/A')}\n"
-        
-        prompt += f"""
+- Lines: {line_count}
+{context}
 # METHODOLOGY
 Follow systematic approach:
 1. Read code and identify security patterns
@@ -121,45 +85,486 @@ CRITICAL RULES:
 - Empty array [] if no issues
 
 Begin analysis:"""
-        
-        return prompt
+
+_BATCH_PROMPT = """You are a senior security engineer auditing code.
+
+# ANALYSIS TASK
+Perform deep security analysis on each of the {count} files below.
+Analyze every file independently; line numbers are relative to each file.
+{context}
+# FILES TO ANALYZE
+{files}
+# PRIORITY VULNERABILITIES
+Look for:
+- 🔴 CRITICAL: SQL injection, command injection, auth bypass, secrets
+- 🟠 HIGH: XSS, deserialization, path traversal, weak crypto
+- 🟡 MEDIUM: Info disclosure, logging, insecure defaults
+- 🔵 LOW: Code quality, performance
+
+# OUTPUT FORMAT (JSON ONLY!)
+One key per file index, each holding that file's findings:
+{{
+  "file_0": [
+    {{
+      "type": "sql-injection",
+      "severity": "critical",
+      "line": 45,
+      "code_snippet": "the vulnerable code",
+      "vulnerability": "Clear explanation",
+      "exploit_scenario": "How attacker exploits this",
+      "impact": "Potential damage",
+      "cwe_id": "CWE-89",
+      "owasp": "A03:2021 - Injection",
+      "fix": "Concrete code example showing fix",
+      "confidence": "high"
+    }}
+  ],
+  "file_1": []
+}}
+
+CRITICAL RULES:
+- Focus on REAL security issues
+- Provide ACTIONABLE fixes with code
+- Include a key for EVERY file, with [] if it has no issues
+- Return ONLY a valid JSON object
+
+Begin analysis:"""
+
+_BATCH_FILE_SECTION = """=== FILE {index}: {filename} ===
+- Language: {language}
+- Lines: {line_count}
+```{language}
+{code}
+```
+"""
+
+
+def _truncate_code(code: str) -> str:
+    """Keep the head and tail of oversized files"""
+    if len(code) > 6000:
+        return code[:3000] + "\n\n... [code truncated] ...\n\n" + code[-3000:]
+    return code
+
+
+def _context_lines(context: Optional[Dict]) -> str:
+    """Prompt lines describing the repository context"""
+    lines = ""
+    if context:
+        if context.get('copilot_detected'):
+            lines += f"\n⚠️  AI-GENERATED CODE DETECTED - Apply extra scrutiny!\n"
+        lines += f"- Repository: {context.get('repository', 'N/A')}\n"
+    return lines
+
+_JSON_FENCE_RE = re.compile(r'```(?:json)?\s*(.*?)```', re.S)
+
+# Characters that can change JSON nesting state
+_JSON_STRUCT_RE = re.compile(r'[\[\]{}"\\]')
+
+
+class _JsonArrayStream:
+    """
+    Incremental parser for a streamed top-level JSON array
+    Tracks bracket depth (string/escape aware) and hands back each
+    element object as soon as its closing brace arrives
+    """
     
-    def _parse_response(self, text: str) -> List[Dict]:
-        """Parse and validate AI response"""
-        try:
-            # Clean text
-            text = text.strip()
-            
-            # Extract JSON
-            if "```json" in text:
-                text = text.split("```json")[1].split("```")[0].strip()
-            elif "```" in text:
-                text = text.split("```")[1].split("```")[0].strip()
+    def __init__(self):
+        self.text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped_at = -1
+        self._obj_start = -1
+        self._done = False
+    
+    def feed(self, chunk: str) -> List[Any]:
+        """Append a chunk and return the objects it completed"""
+        self.text += chunk
+        objects = []
+        
+        for m in _JSON_STRUCT_RE.finditer(self.text, self._pos):
+            if self._done:
+                break
+            i, c = m.start(), m.group()
             
-            # Find JSON array
-            if not text.startswith('['):
-                start = text.find('[')
-                end = text.rfind(']')
-                if start != -1 and end != -1:
-                    text = text[start:end+1]
+            if self._in_string:
+                if i == self._escaped_at:
+                    continue
+                if c == '\\':
+                    self._escaped_at = i + 1
+                elif c == '"':
+                    self._in_string = False
+                continue
             
-            # Parse
-            vulns = json.loads(text)
+            # Skip any preamble up to the array; it must open a line or
+            # follow a fence, so bracketed prose ("lines [3-5]") isn't taken
+            if self._depth == 0:
+                if c == '[' and self._opens_array(i):
+                    self._depth = 1
+                continue
             
-            if not isinstance(vulns, list):
-                vulns = [vulns] if isinstance(vulns, dict) else []
+            if c == '"':
+                self._in_string = True
+            elif c in '[{':
+                if self._depth == 1 and c == '{':
+                    self._obj_start = i
+                self._depth += 1
+            elif c in ']}':
+                self._depth -= 1
+                if self._depth == 1 and c == '}' and self._obj_start != -1:
+                    try:
+                        objects.append(_json_loads(self.text[self._obj_start:i + 1]))
+                    except ValueError:
+                        pass
+                    self._obj_start = -1
+                elif self._depth == 0:
+                    self._done = True
+        
+        self._pos = len(self.text)
+        return objects
+    
+    def _opens_array(self, i: int) -> bool:
+        """Whether the '[' at i starts a line or follows a ``` fence"""
+        lead = self.text[self.text.rfind('\n', 0, i) + 1:i].strip()
+        return not lead or lead.endswith(('```', '```json'))
+    
+    @property
+    def complete(self) -> bool:
+        """Whether the array's closing bracket has been seen"""
+        return self._done
+
+class GeminiAnalyzer:
+    """Advanced AI security analyzer"""
+    
+    def __init__(self, api_key: str):
+        if not api_key:
+            raise ValueError("API key required")
+        
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(
+            'gemini-1.5-pro',
+            generation_config={
+                "temperature": 0.1,
+                "top_p": 0.95,
+                "max_output_tokens": 8192,
+            }
+        )
+        self._cache: "OrderedDict[bytes, Tuple[float, List[Dict]]]" = OrderedDict()
+        logger.info("✅ Gemini initialized")
+    
+    async def analyze_security(self, code: str, filename: str, language: str, context: Optional[Dict] = None) -> List[Dict]:
+        """Deep AI security analysis"""
+        key = self._cache_key(code, filename, language, context)
+        cached = self._cache_get(key)
+        if cached is not None:
+            logger.info(f"✅ AI cache hit for {filename}")
+            return cached
+        
+        try:
+            outcome = {}
+            enriched = [
+                v async for v in self._stream_findings(code, filename, language, context, outcome)
+            ]
             
-            # Validate
-            valid = []
-            for v in vulns:
-                if isinstance(v, dict) and 'type' in v and 'severity' in v:
-                    valid.append(v)
+            logger.info(f"✅ AI found {len(enriched)} issues in {filename}")
+            # An unparseable or truncated reply must not pin an empty or
+            # partial result for the whole TTL
+            if outcome.get('parsed'):
+                self._cache_put(key, enriched)
+            return enriched
             
-            return valid
+        except Exception as e:
+            logger.error(f"❌ AI analysis failed: {e}")
+            return []
+    
+    async def analyze_batch(
+        self,
+        files: List[Tuple[str, str, str]],
+        context: Optional[Dict] = None
+    ) -> List[List[Dict]]:
+        """
+        AI security analysis of many (filename, language, code) files
+        Uncached files are packed into as few prompts as BATCH_MAX_CHARS
+        allows, saving a round trip per file; results follow input order
+        """
+        results: List[Optional[List[Dict]]] = [None] * len(files)
+        batches: List[List[Tuple[int, bytes, str, str, str, str]]] = [[]]
+        batch_chars = 0
+        
+        for i, (filename, language, code) in enumerate(files):
+            key = self._cache_key(code, filename, language, context)
+            cached = self._cache_get(key)
+            if cached is not None:
+                results[i] = cached
+                continue
             
+            # The prompt gets the truncated snippet; the original code is kept
+            # so a per-file fallback hashes and analyzes what the caller sent
+            snippet = _truncate_code(code)
+            if batches[-1] and batch_chars + len(snippet) > BATCH_MAX_CHARS:
+                batches.append([])
+                batch_chars = 0
+            batches[-1].append((i, key, filename, language, code, snippet))
+            batch_chars += len(snippet)
+        
+        await asyncio.gather(*(
+            self._analyze_batch_chunk(batch, context, results)
+            for batch in batches if batch
+        ))
+        return results
+    
+    async def _analyze_batch_chunk(
+        self,
+        batch: List[Tuple[int, bytes, str, str, str, str]],
+        context: Optional[Dict],
+        results: List[Optional[List[Dict]]]
+    ):
+        """Analyze one packed prompt, falling back to per-file calls"""
+        per_file = None
+        try:
+            prompt = self._build_batch_prompt(
+                [(filename, language, snippet) for _, _, filename, language, _, snippet in batch],
+                context
+            )
+            response = await asyncio.to_thread(self.model.generate_content, prompt)
+            per_file = self._parse_batch_response(response.text, len(batch))
         except Exception as e:
-            logger.error(f"Parse failed: {e}")
+            logger.error(f"❌ AI batch analysis failed: {e}")
+        
+        if per_file is None:
+            per_file = [None] * len(batch)
+        
+        # Files the reply left out (or garbled) get their own call
+        missing = [entry for entry, vulns in zip(batch, per_file) if vulns is None]
+        found = await asyncio.gather(*(
+            self.analyze_security(code, filename, language, context)
+            for _, _, filename, language, code, _ in missing
+        ))
+        for (i, *_), findings in zip(missing, found):
+            results[i] = findings
+        
+        answered = 0
+        for (i, key, filename, language, *_), vulns in zip(batch, per_file):
+            if vulns is None:
+                continue
+            enriched = self._enrich(vulns, filename, language)
+            self._cache_put(key, enriched)
+            results[i] = enriched
+            answered += 1
+        
+        if answered:
+            logger.info(
+                f"✅ AI batch: {sum(len(v) for v in per_file if v)} issues in {answered} files"
+            )
+    
+    async def analyze_security_stream(
+        self,
+        code: str,
+        filename: str,
+        language: str,
+        context: Optional[Dict] = None
+    ) -> AsyncIterator[Dict]:
+        """
+        Stream AI findings as the model generates them
+        Each finding is validated, enriched and yielded as soon as its JSON
+        object is complete, instead of after the whole response arrives
+        """
+        async for v in self._stream_findings(code, filename, language, context, {}):
+            yield v
+    
+    async def _stream_findings(
+        self,
+        code: str,
+        filename: str,
+        language: str,
+        context: Optional[Dict],
+        outcome: Dict[str, bool]
+    ) -> AsyncIterator[Dict]:
+        """
+        analyze_security_stream's generator; sets outcome['parsed'] once the
+        whole response was read as JSON (a complete array or bare object)
+        """
+        # Build sophisticated prompt
+        prompt = self._build_prompt(code, filename, language, context)
+        
+        parser = _JsonArrayStream()
+        emitted = 0
+        async for chunk in self._stream_text(prompt):
+            for v in parser.feed(chunk):
+                if isinstance(v, dict) and 'type' in v and 'severity' in v:
+                    emitted += 1
+                    yield self._enrich([v], filename, language)[0]
+        
+        if parser.complete and emitted:
+            outcome['parsed'] = True
+            return
+        
+        # Empty arrays and responses that aren't a plain array (single
+        # object, bracketed prose the stream took for JSON, ...) go through
+        # the full parser before the reply counts as parsed
+        if not emitted:
+            vulns = self._extract_findings(parser.text)
+            if vulns is None:
+                logger.error("Parse failed: no JSON findings in response")
+                return
+            outcome['parsed'] = True
+            for v in self._enrich(vulns, filename, language):
+                yield v
+    
+    async def _stream_text(self, prompt: str) -> AsyncIterator[str]:
+        """Text chunks of a streamed Gemini response"""
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        done = object()
+        
+        # The SDK stream is a blocking iterator - drain it on a worker
+        # thread and hand chunks to the event loop as they arrive
+        def _produce():
+            try:
+                for chunk in self.model.generate_content(prompt, stream=True):
+                    loop.call_soon_threadsafe(queue.put_nowait, chunk.text)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, done)
+        
+        producer = loop.run_in_executor(None, _produce)
+        while True:
+            item = await queue.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+        await producer
+    
+    def _build_prompt(self, code: str, filename: str, language: str, context: Optional[Dict]) -> str:
+        """Advanced prompt with chain-of-thought"""
+        
+        # Truncate if needed
+        code = _truncate_code(code)
+        
+        return _SECURITY_PROMPT.format(
+            language=language,
+            filename=filename,
+            line_count=code.count('\n') + 1,
+            context=_context_lines(context),
+            code=code
+        )
+    
+    def _build_batch_prompt(self, files: List[Tuple[str, str, str]], context: Optional[Dict]) -> str:
+        """One prompt covering several (filename, language, code) files"""
+        sections = "\n".join(
+            _BATCH_FILE_SECTION.format(
+                index=i,
+                filename=filename,
+                language=language,
+                line_count=code.count('\n') + 1,
+                code=code
+            )
+            for i, (filename, language, code) in enumerate(files)
+        )
+        return _BATCH_PROMPT.format(
+            count=len(files),
+            context=_context_lines(context),
+            files=sections
+        )
+    
+    @staticmethod
+    def _cache_key(code: str, filename: str, language: str, context: Optional[Dict]) -> bytes:
+        """Content-addressed key for an analysis request"""
+        h = hashlib.blake2b(digest_size=16)
+        for part in (language, filename, json.dumps(context or {}, sort_keys=True, default=str), code):
+            h.update(part.encode('utf-8'))
+            h.update(b'\x00')
+        return h.digest()
+    
+    def _cache_get(self, key: bytes) -> Optional[List[Dict]]:
+        """Cached findings (as fresh copies) or None if missing/expired"""
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        
+        stored_at, findings = entry
+        if time.monotonic() - stored_at > CACHE_TTL_SECONDS:
+            del self._cache[key]
+            return None
+        
+        self._cache.move_to_end(key)
+        # Callers annotate findings in place (e.g. Copilot scrutiny)
+        return [dict(f) for f in findings]
+    
+    def _cache_put(self, key: bytes, findings: List[Dict]):
+        """Store findings, evicting the least recently used entry"""
+        self._cache[key] = (time.monotonic(), [dict(f) for f in findings])
+        self._cache.move_to_end(key)
+        if len(self._cache) > CACHE_MAX_ENTRIES:
+            self._cache.popitem(last=False)
+    
+    def _parse_response(self, text: str) -> List[Dict]:
+        """Parse and validate AI response"""
+        vulns = self._extract_findings(text)
+        if vulns is None:
+            logger.error("Parse failed: no JSON findings in response")
             return []
+        return vulns
+    
+    def _extract_findings(self, text: str) -> Optional[List[Dict]]:
+        """Validated findings from a response, or None if it holds no JSON"""
+        # Strip a markdown fence, then take the outermost [...] span; the
+        # JSON parser itself handles nesting and brackets inside strings
+        fence = _JSON_FENCE_RE.search(text)
+        text = (fence.group(1) if fence else text).strip()
+        
+        candidates = [text]
+        if not text.startswith(('[', '{')):
+            start = text.find('[')
+            end = text.rfind(']')
+            if start != -1 and end != -1:
+                candidates.insert(0, text[start:end + 1])
+        
+        for candidate in candidates:
+            try:
+                vulns = _json_loads(candidate)
+                break
+            except ValueError:
+                continue
+        else:
+            return None
+        
+        if not isinstance(vulns, list):
+            vulns = [vulns] if isinstance(vulns, dict) else []
+        
+        # Validate
+        return [v for v in vulns if isinstance(v, dict) and 'type' in v and 'severity' in v]
+    
+    def _parse_batch_response(self, text: str, count: int) -> Optional[List[Optional[List[Dict]]]]:
+        """
+        Split a file-indexed batch response; None if it can't be parsed
+        A file whose entry is missing or not a list gets None as well
+        """
+        fence = _JSON_FENCE_RE.search(text)
+        if fence:
+            text = fence.group(1)
+        else:
+            text = text[text.find('{'):text.rfind('}') + 1]
+        
+        try:
+            data = _json_loads(text.strip())
+        except ValueError as e:
+            logger.error(f"Batch parse failed: {e}")
+            return None
+        
+        if not isinstance(data, dict):
+            return None
+        
+        per_file = []
+        for i in range(count):
+            vulns = data.get(f"file_{i}")
+            per_file.append([
+                v for v in vulns if isinstance(v, dict) and 'type' in v and 'severity' in v
+            ] if isinstance(vulns, list) else None)
+        return per_file
     
     def _enrich(self, vulns: List[Dict], filename: str, language: str) -> List[Dict]:
         """Add metadata"""
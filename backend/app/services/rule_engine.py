@@ -3,83 +3,269 @@ Enterprise Rule Engine
 Loads and applies industry-specific compliance rules
 """
 import yaml
+import os
 import re
 import logging
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
+
+from app.core.line_index import LineIndex
+
+try:
+    from re import _parser as _sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse as _sre_parse
+
+try:
+    from yaml import CSafeLoader as _YamlLoader  # libyaml C parser
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
 
 logger = logging.getLogger(__name__)
 
+# Leading global flags, e.g. "(?i)" - only legal at the very start of a
+# pattern, so they are turned into a scoped group before joining
+_GLOBAL_FLAGS_RE = re.compile(r'^\(\?([aiLmsux]+)\)')
+
+# Repository-name keywords that switch on industry packs, in pack order
+_REPO_CLASSIFIERS = (
+    (re.compile(r'bank|payment|finance'), 'banking-pci-dss'),
+    (re.compile(r'health|medical|patient'), 'healthcare-hipaa'),
+    (re.compile(r'gov|federal|fedramp'), 'government-fedramp'),
+    (re.compile(r'telecom|5g|mobile'), 'telecommunications'),
+)
+
+# Shorter literals hit almost every file and are not worth a prefilter
+_MIN_LITERAL_LENGTH = 3
+
+
+def _scoped(pattern: str) -> str:
+    """Rewrite "(?i)expr" as "(?i:expr)" so it can sit in an alternation"""
+    m = _GLOBAL_FLAGS_RE.match(pattern)
+    if m:
+        return f"(?{m.group(1)}:{pattern[m.end():]})"
+    return pattern
+
+
+def _required_literal(pattern: str) -> Optional[str]:
+    """
+    Longest ASCII literal that every match of pattern must contain,
+    lowercased - None when no such literal is long enough
+    Only walks sequences and groups/repeats that must match at least once;
+    alternations and lookarounds end the current run
+    """
+    try:
+        parsed = _sre_parse.parse(pattern)
+    except Exception:
+        return None
+    
+    best = ''
+    
+    def walk(items):
+        nonlocal best
+        run = ''
+        for op, av in items:
+            if op == _sre_parse.LITERAL and av < 128:
+                run += chr(av)
+                continue
+            if len(run) > len(best):
+                best = run
+            run = ''
+            if op == _sre_parse.SUBPATTERN:
+                walk(av[-1])
+            elif op in (_sre_parse.MAX_REPEAT, _sre_parse.MIN_REPEAT) and av[0] >= 1:
+                walk(av[2])
+        if len(run) > len(best):
+            best = run
+    
+    walk(parsed)
+    return best.lower() if len(best) >= _MIN_LITERAL_LENGTH else None
+
+
+def _compile_union(sources: List[str]):
+    """Alternation of scoped pattern sources, or None if it won't compile"""
+    try:
+        return re.compile('|'.join(f'(?:{p})' for p in sources), re.MULTILINE)
+    except re.error:
+        return None
+
 
 class RuleEngine:
     """Enterprise Rule Engine for compliance checking"""
     
     def __init__(self, rules_dir: str = "rules"):
         self.rules_dir = Path(rules_dir)
+        self.pack_files = {}
         self.rule_packs = {}
         self.compiled_patterns = {}
-        self._load_rule_packs()
+        self.union_patterns = {}
+        self._pack_mtimes = {}
+        self._discover_rule_packs()
     
-    def _load_rule_packs(self):
-        """Load all YAML rule packs"""
+    def _discover_rule_packs(self):
+        """Find YAML rule packs; parsing is deferred to first use"""
         if not self.rules_dir.exists():
             logger.warning(f"Rules directory not found: {self.rules_dir}")
             return
         
         for rule_file in self.rules_dir.glob("*.yaml"):
-            try:
-                with open(rule_file, 'r') as f:
-                    rule_pack = yaml.safe_load(f)
-                
-                pack_name = rule_file.stem
-                self.rule_packs[pack_name] = rule_pack
-                self._compile_patterns(pack_name, rule_pack)
-                
-                logger.info(f"Loaded rule pack: {pack_name}")
-            except Exception as e:
-                logger.error(f"Failed to load {rule_file}: {e}")
+            self.pack_files[rule_file.stem] = rule_file
+    
+    def get_available_packs(self) -> List[str]:
+        """Names of all rule packs in the rules directory"""
+        return list(self.pack_files.keys())
+    
+    def _ensure_pack_loaded(self, pack_name: str) -> bool:
+        """Load a pack on first use, or again if its file has changed"""
+        rule_file = self.pack_files.get(pack_name)
+        if rule_file is None:
+            return False
+        
+        try:
+            mtime = rule_file.stat().st_mtime_ns
+        except OSError as e:
+            logger.error(f"Failed to load {rule_file}: {e}")
+            return False
+        
+        if self._pack_mtimes.get(pack_name) != mtime:
+            self._pack_mtimes[pack_name] = mtime
+            self._load_rule_pack(pack_name, rule_file)
+        
+        return pack_name in self.compiled_patterns
+    
+    def _load_rule_pack(self, pack_name: str, rule_file: Path):
+        """Parse and compile one YAML rule pack"""
+        self.rule_packs.pop(pack_name, None)
+        self.compiled_patterns.pop(pack_name, None)
+        self.union_patterns.pop(pack_name, None)
+        
+        try:
+            with open(rule_file, 'r') as f:
+                rule_pack = yaml.load(f, Loader=_YamlLoader)
+            
+            self.rule_packs[pack_name] = rule_pack
+            self._compile_patterns(pack_name, rule_pack)
+            
+            logger.info(f"Loaded rule pack: {pack_name}")
+        except Exception as e:
+            self.rule_packs.pop(pack_name, None)
+            self.compiled_patterns.pop(pack_name, None)
+            logger.error(f"Failed to load {rule_file}: {e}")
     
     def _compile_patterns(self, pack_name, rule_pack):
         """Pre-compile regex patterns"""
         self.compiled_patterns[pack_name] = []
+        sources = []
         
         rules = rule_pack.get('rules', {})
         for rule_id, rule_def in rules.items():
             patterns = rule_def.get('patterns', [])
             compiled = []
+            literals = []
+            scoped = []
             
             for pattern in patterns:
                 try:
                     compiled.append(re.compile(pattern))
+                    literals.append(_required_literal(pattern))
+                    scoped.append(_scoped(pattern))
                 except:
                     pass
             
             self.compiled_patterns[pack_name].append({
                 'rule_id': rule_id,
                 'rule_def': rule_def,
-                'patterns': compiled
+                'patterns': compiled,
+                'literals': literals,
+                'sources': scoped
             })
+            sources.extend(scoped)
+        
+        # One alternation over every pattern in the pack - lines it misses
+        # cannot match any single rule, so they are skipped in one C call
+        self.union_patterns[pack_name] = _compile_union(sources)
+        if self.union_patterns[pack_name] is None:
+            logger.warning(f"Union pattern disabled for {pack_name}")
     
     def analyze_code(self, code: str, filename: str, enabled_packs: Optional[List[str]] = None) -> List[Dict]:
         """Analyze code against rule packs"""
         violations = []
-        packs = enabled_packs if enabled_packs else list(self.rule_packs.keys())
+        packs = enabled_packs if enabled_packs else self.get_available_packs()
         
         for pack_name in packs:
-            if pack_name not in self.compiled_patterns:
+            if not self._ensure_pack_loaded(pack_name):
                 continue
             violations.extend(self._check_pack(code, filename, pack_name))
         
         return violations
     
+    def analyze_files(
+        self,
+        files: List[Tuple[str, str]],
+        enabled_packs: Optional[List[str]] = None
+    ) -> List[List[Dict]]:
+        """
+        Analyze (code, filename) pairs across all CPU cores
+        Pack checks are CPU-bound regex work under the GIL, so whole files
+        go to worker processes (each loads packs once); results come back
+        in input order
+        """
+        with ProcessPoolExecutor(
+            max_workers=os.cpu_count(),
+            initializer=_init_worker,
+            initargs=(str(self.rules_dir),)
+        ) as pool:
+            return list(pool.map(
+                _analyze_worker,
+                [code for code, _ in files],
+                [filename for _, filename in files],
+                [enabled_packs] * len(files)
+            ))
+    
     def _check_pack(self, code, filename, pack_name):
         """Check code against specific pack"""
         violations = []
-        lines = code.split('\n')
         
+        # Literal prefilter: a pattern whose required literal is absent from
+        # the file cannot match anywhere. Case-insensitive matching can pair
+        # non-ASCII text with ASCII literals, so those files skip the filter
+        haystack = code.lower() if code.isascii() else None
+        active = []
+        active_sources = []
+        filtered = False
         for rule_entry in self.compiled_patterns[pack_name]:
-            for pattern in rule_entry['patterns']:
-                for i, line in enumerate(lines, 1):
+            patterns = []
+            for pattern, literal, source in zip(
+                rule_entry['patterns'], rule_entry['literals'], rule_entry['sources']
+            ):
+                if haystack is None or literal is None or literal in haystack:
+                    patterns.append(pattern)
+                    active_sources.append(source)
+                else:
+                    filtered = True
+            if patterns:
+                active.append((rule_entry, patterns))
+        
+        if not active:
+            return violations
+        
+        index = LineIndex(code)
+        
+        # Only lines hit by the pack's union need the per-pattern checks;
+        # those still run so a line matching several rules reports each.
+        # A union over just the surviving patterns comes from re's own cache
+        union = self.union_patterns.get(pack_name)
+        if union is not None and filtered:
+            union = _compile_union(active_sources)
+        if union is not None:
+            lines = self._candidate_lines(union, index)
+        else:
+            lines = list(enumerate(code.split('\n'), 1))
+        
+        for rule_entry, patterns in active:
+            for pattern in patterns:
+                for i, line in lines:
                     if pattern.search(line):
                         violations.append(self._create_violation(
                             rule_entry['rule_id'],
@@ -91,6 +277,27 @@ class RuleEngine:
                         ))
         return violations
     
+    def _candidate_lines(self, union, index: LineIndex) -> List[Tuple[int, str]]:
+        """
+        Lines the union matches, found by searching the whole buffer
+        Resumes at the next line start after each hit; a hit that spans a
+        newline is re-checked against its own line to keep per-line semantics
+        """
+        code, starts = index.code, index.line_starts
+        lines = []
+        
+        m = union.search(code)
+        while m:
+            line_num = index.line_of(m.start())
+            line = index.line_text(line_num)
+            if '\n' not in m.group() or union.search(line):
+                lines.append((line_num, line))
+            if line_num >= len(starts):
+                break
+            m = union.search(code, starts[line_num])
+        
+        return lines
+    
     def _create_violation(self, rule_id, rule_def, line_num, snippet, filename, pack):
         """Create violation dict"""
         compliance = []
@@ -121,13 +328,17 @@ class RuleEngine:
         packs = ['security-rules']
         repo_lower = repo.lower()
         
-        if any(w in repo_lower for w in ['bank', 'payment', 'finance']):
-            packs.append('banking-pci-dss')
-        if any(w in repo_lower for w in ['health', 'medical', 'patient']):
-            packs.append('healthcare-hipaa')
-        if any(w in repo_lower for w in ['gov', 'federal', 'fedramp']):
-            packs.append('government-fedramp')
-        if any(w in repo_lower for w in ['telecom', '5g', 'mobile']):
-            packs.append('telecommunications')
+        packs += [pack for rx, pack in _REPO_CLASSIFIERS if rx.search(repo_lower)]
         
         return packs
+
+
+# Per-process engine used by analyze_files workers
+_worker_engine = None
+
+def _init_worker(rules_dir: str):
+    global _worker_engine
+    _worker_engine = RuleEngine(rules_dir)
+
+def _analyze_worker(code: str, filename: str, enabled_packs: Optional[List[str]]) -> List[Dict]:
+    return _worker_engine.analyze_code(code, filename, enabled_packs)